@@ -0,0 +1,142 @@
+import os
+import re
+from typing import Dict, List
+
+import numpy as np
+
+# ---------------- CONFIG ----------------
+CLAIM_DEDUP_ENABLED = os.environ.get("CLAIM_DEDUP", "1") == "1"
+# Claims of one paper all talk about the same comparison, so e5 scores
+# between them run high; tune with scripts/calibrate_threshold.py.
+CLAIM_DEDUP_THRESHOLD = float(os.environ.get("CLAIM_DEDUP_THRESHOLD", "0.95"))
+
+# Sentence embeddings barely separate "A improved B" from "no significant
+# difference between A and B"; claims whose polarity, direction or
+# numbers differ are never merged, however similar they embed.
+_NEGATION_RE = re.compile(
+    r"\b(?:no|not|never|none|neither|nor|without|cannot|fail(?:s|ed)?|"
+    r"insignificant|non-?significant)\b|n't\b",
+    re.IGNORECASE
+)
+_DIRECTION_RES = {
+    "up": re.compile(
+        r"\b(?:higher|better|more|superior|improv\w*|increas\w*|outperform\w*|gain(?:s|ed)?)\b"
+    ),
+    "down": re.compile(
+        r"\b(?:lower|worse|less|fewer|inferior|declin\w*|decreas\w*|reduc\w*|"
+        r"underperform\w*|drop(?:s|ped)?)\b"
+    ),
+}
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _claim_signature(text: str) -> tuple:
+    """
+    What two claims must agree on before they may be merged: negation,
+    direction of the effect and the numbers they state.
+    """
+    lowered = text.lower()
+    directions = frozenset(d for d, pattern in _DIRECTION_RES.items() if pattern.search(lowered))
+    return (
+        bool(_NEGATION_RE.search(lowered)),
+        directions,
+        frozenset(_NUMBER_RE.findall(lowered)),
+    )
+
+
+def dedupe_claims(claims: List[Dict], encode_fn, threshold: float = CLAIM_DEDUP_THRESHOLD,
+                  deadline=None):
+    """
+    Collapse near-duplicate claims before validation.
+
+    Claims are embedded in one batch with `encode_fn(texts)` (normalised
+    vectors) and clustered greedily: each claim joins the most similar
+    existing representative at or above `threshold`, otherwise it starts
+    a new cluster. Claims only cluster with claims of the same
+    `_claim_signature`. LLM-extracted claims are visited first so they
+    become representatives over fallback ones. Evidence of a cluster is
+    merged into its representative; since no single span covers the
+    merged evidence, its `highlight` is replaced by `highlights`, one
+    per merged claim.
+
+    Dedup is only an optimisation: when `deadline` has no time left or
+    encoding fails, the claims are returned unchanged.
+
+    Every removed claim saves its validate call. It saves a summarize
+    call only if it would have passed validation, so that figure is an
+    upper bound.
+
+    Returns (kept_claims, stats).
+    """
+    stats = {
+        "input": len(claims),
+        "kept": len(claims),
+        "removed": 0,
+        "validate_calls_saved": 0,
+        "summarize_calls_saved_max": 0
+    }
+    if len(claims) <= 1:
+        return claims, stats
+
+    if deadline is not None and deadline.expired():
+        deadline.degraded = True
+        return claims, stats
+
+    texts = [f"query: {c.get('claim', '')}" for c in claims]
+    try:
+        vectors = np.asarray(encode_fn(texts), dtype=np.float32)
+    except Exception as e:
+        print(f"[DEDUP][ERROR] Encoding failed, keeping all claims: {e}")
+        if deadline is not None:
+            deadline.degraded = True
+        return claims, stats
+    sims = vectors @ vectors.T
+
+    signatures = [_claim_signature(c.get("claim", "")) for c in claims]
+    order = sorted(range(len(claims)), key=lambda i: claims[i].get("source") != "explicit")
+    reps = []
+    members = {}
+
+    for i in order:
+        compatible = [r for r in reps if signatures[r] == signatures[i]]
+        if compatible:
+            best = max(compatible, key=lambda r: sims[i, r])
+            if sims[i, best] >= threshold:
+                members[best].append(i)
+                continue
+        reps.append(i)
+        members[i] = [i]
+
+    kept = []
+    for r in sorted(reps):
+        cluster = members[r]
+        if len(cluster) == 1:
+            kept.append(claims[r])
+            continue
+
+        evidence = []
+        highlights = []
+        for i in cluster:
+            e = claims[i].get("evidence", "").strip()
+            if e and e not in evidence:
+                evidence.append(e)
+            h = claims[i].get("highlight")
+            if h and h not in highlights:
+                highlights.append(h)
+
+        kept.append({
+            **claims[r],
+            "evidence": "\n".join(evidence),
+            "highlight": None,
+            "highlights": highlights,
+            "merged_claims": len(cluster)
+        })
+
+    removed = len(claims) - len(kept)
+    stats.update({
+        "kept": len(kept),
+        "removed": removed,
+        "validate_calls_saved": removed,
+        "summarize_calls_saved_max": removed
+    })
+    return kept, stats
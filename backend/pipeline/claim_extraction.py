@@ -1,17 +1,13 @@
 import json
-import os
-from dotenv import load_dotenv
-from groq import Groq
 import re
 import time
 
-load_dotenv()
+from pipeline.deadline import Deadline, bounded_client
+from pipeline.llm_client import get_client
+from pipeline.sentence_index import chunk_sentence_index, locate_evidence
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 MODEL_NAME = "llama-3.1-8b-instant"
-client = Groq(api_key=GROQ_API_KEY)
 
-_SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
 
 def safe_json_load(text: str):
     """
@@ -28,29 +24,29 @@ def safe_json_load(text: str):
         return None
 
 
-def _heuristic_extract_from_text(text: str, max_claims: int = 5):
+def _heuristic_extract_from_chunks(chunks: list, max_claims: int = 5, max_chars: int = 2000):
     """
-    Conservative regex-based fallback to find candidate claim sentences.
+    Conservative keyword-based fallback to find candidate claim sentences.
+    Reads the precomputed sentence spans and keyword masks of each chunk.
     """
-    keywords = [
-        "significant", "no significant", "increased", "decreased", "improved",
-        "worse", "better", "compared to", "compared with", "equivalent",
-        "similar", "performance", "outcome", "grade", "score", "p <", "p =",
-        "odds ratio", "effect size", "confidence interval"
-    ]
-    sents = _SENT_SPLIT_RE.split(text)
     candidates = []
-    for s in sents:
-        lower = s.lower()
-        if any(k in lower for k in keywords):
-            sent = s.strip()
+    for chunk in chunks:
+        text = chunk.get("text", "")
+        spans, masks = chunk_sentence_index(chunk)
+        for (start, end), mask in zip(spans, masks):
+            if start >= max_chars:
+                break
+            if not mask:
+                continue
+            sent = text[start:end].strip()
             if len(sent) > 20:
                 candidates.append({
                     "claim": re.sub(r'\s+', ' ', sent)[:600],
-                    "evidence": sent[:1200]
+                    "evidence": sent[:1200],
+                    "highlight": {"chunk_id": chunk.get("chunk_id"), "start": start, "end": end}
                 })
-        if len(candidates) >= max_claims:
-            break
+            if len(candidates) >= max_claims:
+                return candidates
     return candidates
 
 
@@ -58,10 +54,12 @@ def extract_claims_per_paper(
     retrieved_chunks: dict,
     structured_query: dict,
     prompt_template: str,
-    question: str
+    question: str,
+    deadline: Deadline | None = None
 ) -> dict:
     """
     Extract EXPLICIT claims from each paper.
+    Papers reached after the deadline use heuristic extraction.
     """
 
     results = {}
@@ -103,30 +101,37 @@ def extract_claims_per_paper(
             .replace("{{RETRIEVED_CHUNKS}}", combined_text)
         )
 
-        try:
-            completion = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0,
-                max_tokens=600
-            )
-        except Exception as e:
-            print(f"[EXTRACT][ERROR] LLM call failed for {paper_id}: {e}")
-            results[paper_id] = {"claims": []}
-            continue
-
-        raw = completion.choices[0].message.content.strip()
-
-        parsed = safe_json_load(raw)
+        parsed = None
+        if deadline is not None and deadline.expired():
+            print(f"[EXTRACT] Deadline reached for {paper_id} — using fallback extraction")
+            deadline.degraded = True
+        else:
+            try:
+                completion = bounded_client(get_client(), deadline).chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0,
+                    max_tokens=600
+                )
+                raw = completion.choices[0].message.content.strip()
+                parsed = safe_json_load(raw)
+            except Exception as e:
+                print(f"[EXTRACT][ERROR] LLM call failed for {paper_id}: {e}")
+                if deadline is None:
+                    results[paper_id] = {"claims": []}
+                    continue
+                deadline.degraded = True
 
         # ---- PRIMARY PATH: LLM-extracted claims ----
         if parsed and "claims" in parsed:
             extracted_claims = []
             for c in parsed.get("claims", []):
+                evidence = (c.get("evidence") or c.get("evidence_text") or "").strip()
                 extracted_claims.append({
                     "claim": (c.get("claim") or c.get("text") or "").strip(),
-                    "evidence": (c.get("evidence") or c.get("evidence_text") or "").strip(),
-                    "source": "explicit"  # LLM-extracted
+                    "evidence": evidence,
+                    "source": "explicit",  # LLM-extracted
+                    "highlight": locate_evidence(evidence, chosen)
                 })
 
             results[paper_id] = {"claims": extracted_claims}
@@ -137,16 +142,17 @@ def extract_claims_per_paper(
 
 
         # ---- FALLBACK PATH: Heuristic extraction ----
-        print(f"[EXTRACT] JSON parse failed for {paper_id} — attempting fallback extraction")
+        print(f"[EXTRACT] No parsed claims for {paper_id} — attempting fallback extraction")
 
-        fallback_claims = _heuristic_extract_from_text(combined_text)
+        fallback_claims = _heuristic_extract_from_chunks(chosen)
 
         results[paper_id] = {
             "claims": [
                 {
                     "claim": c.get("claim", "").strip(),
                     "evidence": c.get("evidence", "").strip(),
-                    "source": "explicit_fallback"  # heuristic fallback
+                    "source": "explicit_fallback",  # heuristic fallback
+                    "highlight": c.get("highlight")
                 }
                 for c in fallback_claims
             ]
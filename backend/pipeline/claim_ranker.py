@@ -1,23 +1,21 @@
 import json
-from groq import Groq
-from dotenv import load_dotenv
-import os
 
-load_dotenv()
+from pipeline.deadline import Deadline, bounded_client
+from pipeline.llm_client import get_client
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 MODEL_NAME = "llama-3.1-8b-instant"
-client = Groq(api_key=GROQ_API_KEY)
 
 
 def rank_claims(
     question: str,
     claims: list,
-    prompt_template: str
+    prompt_template: str,
+    deadline: Deadline | None = None
 ) -> list:
     """
     Rank claims by relevance to the question.
     Guarantees LLM-extracted claims ('explicit') are ranked ABOVE fallback claims
+    Groups reached after the deadline, or whose call fails, keep their order.
     """
 
     if len(claims) <= 1:
@@ -41,12 +39,22 @@ def rank_claims(
             .replace("{{CLAIMS}}", "\n".join(claims_block))
         )
 
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            max_tokens=120
-        )
+        if deadline is not None and deadline.expired():
+            deadline.degraded = True
+            return claim_group
+
+        try:
+            completion = bounded_client(get_client(), deadline).chat.completions.create(
+                model=MODEL_NAME,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0,
+                max_tokens=120
+            )
+        except Exception as e:
+            print(f"[RANK][ERROR] LLM call failed: {e}")
+            if deadline is not None:
+                deadline.degraded = True
+            return claim_group
 
         raw = completion.choices[0].message.content.strip()
 
@@ -1,17 +1,11 @@
 import json
-import os
 from typing import List, Dict
 
-from groq import Groq
-from dotenv import load_dotenv
+from pipeline.deadline import Deadline, bounded_client
+from pipeline.llm_client import get_client
 
-load_dotenv()
-
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 MODEL_NAME = "llama-3.1-8b-instant"
 
-client = Groq(api_key=GROQ_API_KEY)
-
 PROMPT_PATH = "prompts/summarize_claim.txt"
 
 
@@ -20,9 +14,10 @@ def load_prompt() -> str:
         return f.read()
 
 
-def summarize_claims(claims: List[Dict]) -> List[Dict]:
+def summarize_claims(claims: List[Dict], deadline: Deadline | None = None) -> List[Dict]:
     """
     Convert extracted evidence into concise, paper-faithful claims.
+    Claims reached after the deadline, or whose call fails, stay unsummarised.
     """
 
     prompt_template = load_prompt()
@@ -35,14 +30,26 @@ def summarize_claims(claims: List[Dict]) -> List[Dict]:
             summarized.append(claim_obj)
             continue
 
+        if deadline is not None and deadline.expired():
+            deadline.degraded = True
+            summarized.append(claim_obj)
+            continue
+
         prompt = prompt_template.replace("{{EVIDENCE}}", evidence)
 
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            max_tokens=120
-        )
+        try:
+            completion = bounded_client(get_client(), deadline).chat.completions.create(
+                model=MODEL_NAME,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0,
+                max_tokens=120
+            )
+        except Exception as e:
+            print(f"[SUMMARIZE][ERROR] LLM call failed: {e}")
+            if deadline is not None:
+                deadline.degraded = True
+            summarized.append(claim_obj)
+            continue
 
         raw = completion.choices[0].message.content.strip()
 
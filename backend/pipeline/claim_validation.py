@@ -1,15 +1,10 @@
 import json
-import os
-from dotenv import load_dotenv
-from groq import Groq
 
-load_dotenv()
+from pipeline.deadline import Deadline, bounded_client
+from pipeline.llm_client import get_client
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 MODEL_NAME = "llama-3.1-8b-instant"
 
-client = Groq(api_key=GROQ_API_KEY)
-
 
 def safe_json_load(text: str):
     start = text.find("{")
@@ -25,8 +20,13 @@ def validate_claim(
     question: str,
     structured_query: dict,
     claim: dict,
-    prompt_template: str
+    prompt_template: str,
+    deadline: Deadline | None = None
 ):
+    if deadline is not None and deadline.expired():
+        deadline.degraded = True
+        return {"is_valid": True, "reason": "Deadline reached; default keep"}
+
     prompt = (
         prompt_template
         .replace("{{QUESTION}}", question)
@@ -36,13 +36,15 @@ def validate_claim(
     )
 
     try:
-        completion = client.chat.completions.create(
+        completion = bounded_client(get_client(), deadline).chat.completions.create(
             model=MODEL_NAME,
             messages=[{"role": "user", "content": prompt}],
             temperature=0,
             max_tokens=120
         )
     except Exception as e:
+            if deadline is not None:
+                deadline.degraded = True
             return {
                 "is_valid": True,
                 "reason": f"Validator LLM error; default keep ({str(e)})"
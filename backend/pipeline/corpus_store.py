@@ -0,0 +1,172 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# ---------------- CONFIG ----------------
+DATA_DIR = "data"
+COLLECTIONS_DIR = os.path.join(DATA_DIR, "collections")
+DEFAULT_COLLECTION = "default"
+
+# Memory budget for indexes kept resident across all collections
+INDEX_CACHE_MAX_MB = float(os.environ.get("INDEX_CACHE_MAX_MB", "512"))
+
+_COLLECTION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def validate_collection_id(collection_id: str) -> str:
+    if not collection_id or not _COLLECTION_ID_RE.match(collection_id):
+        raise ValueError(
+            f"Invalid collection id {collection_id!r}; "
+            "use 1-64 letters, digits, '-' or '_'"
+        )
+    return collection_id
+
+
+def collection_dir(collection_id: str) -> str:
+    """
+    The default collection keeps the original data/ layout so existing
+    deployments keep their corpus; every other collection lives under
+    data/collections/<collection_id>/.
+    """
+    validate_collection_id(collection_id)
+    if collection_id == DEFAULT_COLLECTION:
+        return DATA_DIR
+    return os.path.join(COLLECTIONS_DIR, collection_id)
+
+
+def collection_paths(collection_id: str) -> dict:
+    root = collection_dir(collection_id)
+    return {
+        "root": root,
+        "papers": os.path.join(root, "papers"),
+        "chunks": os.path.join(root, "processed_chunks.json"),
+        "embeddings": os.path.join(root, "processed_embeddings.npy"),
+        "evidence": os.path.join(root, "evidence_scores.npy"),
+        "meta": os.path.join(root, "embedding_meta.json"),
+    }
+
+
+def collection_exists(collection_id: str) -> bool:
+    """
+    True once the collection has been ingested (its chunk file exists).
+    """
+    try:
+        return os.path.exists(collection_paths(collection_id)["chunks"])
+    except ValueError:
+        return False
+
+
+def list_collections() -> list:
+    collections = []
+    if collection_exists(DEFAULT_COLLECTION):
+        collections.append(DEFAULT_COLLECTION)
+    if os.path.isdir(COLLECTIONS_DIR):
+        for name in sorted(os.listdir(COLLECTIONS_DIR)):
+            if name != DEFAULT_COLLECTION and collection_exists(name):
+                collections.append(name)
+    return collections
+
+
+# ---------------- RESIDENT INDEX LRU ----------------
+class IndexCache:
+    """
+    Memory-capped LRU of loaded collection indexes.
+
+    `loader(collection_id)` builds an index lazily on first use and
+    `sizer(index)` reports its resident size in bytes. A loader result of
+    None (no corpus) is returned but never cached. The most recently
+    used index is always kept, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, loader, sizer, max_bytes: int):
+        self._loader = loader
+        self._sizer = sizer
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()  # collection_id -> (index, nbytes)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load_lock(self, collection_id: str):
+        with self._lock:
+            lock = self._load_locks.get(collection_id)
+            if lock is None:
+                lock = self._load_locks[collection_id] = threading.Lock()
+            return lock
+
+    def get(self, collection_id: str):
+        with self._lock:
+            entry = self._entries.get(collection_id)
+            if entry is not None:
+                self._entries.move_to_end(collection_id)
+                self.hits += 1
+                return entry[0]
+
+        # Load outside the global lock so one cold collection does not
+        # block queries against resident ones.
+        load_lock = self._load_lock(collection_id)
+        try:
+            with load_lock:
+                with self._lock:
+                    entry = self._entries.get(collection_id)
+                    if entry is not None:
+                        self._entries.move_to_end(collection_id)
+                        self.hits += 1
+                        return entry[0]
+                    self.misses += 1
+
+                index = self._loader(collection_id)
+                if index is None:
+                    return None
+                nbytes = self._sizer(index)
+
+                with self._lock:
+                    self._entries[collection_id] = (index, nbytes)
+                    self._entries.move_to_end(collection_id)
+                    self._evict()
+
+                print(f"[INDEX] Loaded collection '{collection_id}' ({nbytes / 1e6:.1f} MB)")
+                return index
+        finally:
+            # Waiters still hold a reference; later callers hit the cache
+            with self._lock:
+                if self._load_locks.get(collection_id) is load_lock:
+                    del self._load_locks[collection_id]
+
+    def peek(self, collection_id: str):
+        """
+        Resident index, or None. Never loads and does not touch LRU order.
+        """
+        with self._lock:
+            entry = self._entries.get(collection_id)
+            return entry[0] if entry is not None else None
+
+    def _evict(self):
+        while len(self._entries) > 1 and self.resident_bytes() > self.max_bytes:
+            evicted_id, (_, nbytes) = self._entries.popitem(last=False)
+            self.evictions += 1
+            print(f"[INDEX] Evicted collection '{evicted_id}' ({nbytes / 1e6:.1f} MB)")
+
+    def invalidate(self, collection_id: str):
+        with self._lock:
+            self._entries.pop(collection_id, None)
+
+    def resident_bytes(self) -> int:
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "resident": list(self._entries.keys()),
+                "loading": list(self._load_locks.keys()),
+                "resident_mb": round(self.resident_bytes() / 1e6, 2),
+                "max_mb": round(self.max_bytes / 1e6, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
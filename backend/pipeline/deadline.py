@@ -0,0 +1,88 @@
+import os
+import time
+
+# ---------------- CONFIG ----------------
+DEFAULT_DEADLINE_S = float(os.environ.get("ANALYZE_DEADLINE_S", "60"))
+
+# Relative share of the remaining request budget each stage may use.
+# Shares are re-split over the stages still to run, so slack left by a
+# fast stage flows to the ones after it.
+STAGE_WEIGHTS = {
+    "parse": 1.0,
+    "retrieve": 1.0,
+    "extract": 4.0,
+    "dedup": 0.5,
+    "validate": 3.0,
+    "summarize": 2.0,
+    "rank": 1.0,
+}
+
+# Never hand an LLM call a timeout shorter than this; below it the call
+# cannot succeed and we degrade straight away instead.
+MIN_CALL_TIMEOUT_S = 0.25
+
+
+class Deadline:
+    """
+    A point in time after which work should stop and degrade.
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+        # Set by a stage when it fell back to its degraded behaviour
+        self.degraded = False
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() < MIN_CALL_TIMEOUT_S
+
+    def timeout(self) -> float:
+        """
+        Per-call timeout to hand to the LLM client.
+        """
+        return max(MIN_CALL_TIMEOUT_S, self.remaining())
+
+
+class RequestBudget:
+    """
+    End-to-end deadline for one /analyze request, split across stages.
+    """
+
+    def __init__(self, total_s: float | None = None):
+        self.total_s = total_s if total_s and total_s > 0 else DEFAULT_DEADLINE_S
+        self.started_at = time.monotonic()
+        self.deadline = Deadline(self.started_at + self.total_s)
+        self.degraded = []
+
+    def stage(self, name: str) -> Deadline:
+        """
+        Deadline for a stage starting now: its weighted share of whatever
+        time is left, given the stages that come after it.
+        """
+        stages = list(STAGE_WEIGHTS)
+        pending = stages[stages.index(name):]
+        share = STAGE_WEIGHTS[name] / sum(STAGE_WEIGHTS[s] for s in pending)
+
+        now = time.monotonic()
+        remaining = self.deadline.remaining()
+        return Deadline(min(self.deadline.expires_at, now + remaining * share))
+
+    def mark_degraded(self, name: str):
+        if name not in self.degraded:
+            self.degraded.append(name)
+            print(f"[DEADLINE] Stage '{name}' degraded")
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+
+def bounded_client(client, deadline: Deadline | None):
+    """
+    Client view whose requests respect `deadline`. Retries are disabled,
+    since a retry would silently outlive the budget.
+    """
+    if deadline is None:
+        return client
+    return client.with_options(timeout=deadline.timeout(), max_retries=0)
@@ -0,0 +1,135 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+# ---------------- CONFIG ----------------
+EMBED_BATCH_WINDOW_MS = float(os.environ.get("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_MAX_BATCH = int(os.environ.get("EMBED_MAX_BATCH", "32"))
+
+# Queueing-delay samples kept for percentile metrics
+_DELAY_SAMPLES = 1000
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent encode requests and runs them as one batch.
+
+    The first queued text opens a window of `window_ms`; everything that
+    arrives before it closes (up to `max_batch` texts) is encoded with a
+    single `encode_fn(texts)` call and each caller gets its own row back.
+    """
+
+    def __init__(self, encode_fn, max_batch: int = EMBED_MAX_BATCH,
+                 window_ms: float = EMBED_BATCH_WINDOW_MS):
+        self._encode_fn = encode_fn
+        self.max_batch = max(1, max_batch)
+        self.window_s = max(0.0, window_ms) / 1000.0
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._batch_sizes = {}
+        self._delays_ms = deque(maxlen=_DELAY_SAMPLES)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            # Also replaces a worker that died, so queued texts are not stranded
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def encode(self, text: str, timeout: float | None = None):
+        """
+        Embedding of one text; blocks until its batch has run, or raises
+        TimeoutError after `timeout` seconds.
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, time.monotonic(), future))
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            # Dropped from its batch if that has not started yet
+            future.cancel()
+            raise TimeoutError(f"Embedding not ready within {timeout}s")
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        closes_at = time.monotonic() + self.window_s
+
+        while len(batch) < self.max_batch:
+            timeout = closes_at - time.monotonic()
+            try:
+                if timeout <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Skip callers that already gave up
+            batch = [item for item in self._collect() if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.monotonic()
+
+            # Every future of the batch is resolved, whatever goes wrong
+            try:
+                vectors = self._encode_fn([text for text, _, _ in batch])
+                if len(vectors) != len(batch):
+                    raise ValueError(f"Encoder returned {len(vectors)} rows for {len(batch)} texts")
+                for i, (_, _, future) in enumerate(batch):
+                    future.set_result(vectors[i])
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+                for _, enqueued, _ in batch:
+                    self._delays_ms.append((started - enqueued) * 1000.0)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            delays = list(self._delays_ms)
+            return {
+                "window_ms": self.window_s * 1000.0,
+                "max_batch": self.max_batch,
+                "batches": self._batches,
+                "requests": self._requests,
+                "mean_batch_size": round(self._requests / self._batches, 3) if self._batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "queue_delay_ms": {
+                    "p50": round(_percentile(delays, 0.50), 3),
+                    "p95": round(_percentile(delays, 0.95), 3),
+                    "p99": round(_percentile(delays, 0.99), 3),
+                    "max": round(max(delays), 3) if delays else 0.0,
+                },
+            }
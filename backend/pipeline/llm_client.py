@@ -0,0 +1,22 @@
+import os
+import threading
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Shared Groq client, created on first use so importing the pipeline
+    does not pay for the SDK import or client setup.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from dotenv import load_dotenv
+                from groq import Groq
+
+                load_dotenv()
+                _client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    return _client
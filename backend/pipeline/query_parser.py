@@ -1,19 +1,15 @@
 import json
-from dotenv import load_dotenv
-import os
-from groq import Groq
 
-load_dotenv()
+from pipeline.deadline import Deadline, bounded_client
+from pipeline.llm_client import get_client
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 MODEL_NAME = "llama-3.1-8b-instant"
 
-client = Groq(api_key=GROQ_API_KEY)
 
-def parse_query(question: str, prompt_template: str) -> dict:
+def parse_query(question: str, prompt_template: str, deadline: Deadline | None = None) -> dict:
     prompt = prompt_template.replace("{{USER_QUESTION}}", question)
 
-    completion = client.chat.completions.create(
+    completion = bounded_client(get_client(), deadline).chat.completions.create(
         model=MODEL_NAME,
         messages=[{"role": "user", "content": prompt}],
         temperature=0,
@@ -3,17 +3,102 @@ import json
 import hashlib
 import numpy as np
 import re
+import sys
+import threading
 from collections import defaultdict
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from contextlib import nullcontext
+
+from pipeline.embedding_batcher import EmbeddingBatcher
+from pipeline.sentence_index import chunk_sentence_index
+from pipeline.shared_index import SHARED_INDEX, load_array, publish_lock, save_array
+from pipeline.corpus_store import (
+    DEFAULT_COLLECTION,
+    INDEX_CACHE_MAX_MB,
+    IndexCache,
+    collection_paths,
+)
 
 # ---------------- CONFIG ----------------
 EMBEDDING_MODEL = "intfloat/e5-small-v2"
-CHUNK_FILE = "data/processed_chunks.json"
-EMBED_FILE = "data/processed_embeddings.npy"
-META_FILE = "data/embedding_meta.json"
 
-model = SentenceTransformer(EMBEDDING_MODEL)
+# When set, encoding goes to a shared sidecar (scripts/encoder_sidecar.py)
+# and this process never loads model weights.
+ENCODER_URL = os.environ.get("ENCODER_URL")
+ENCODER_REQUEST_SIZE = 256
+# Per-request sidecar timeout when the caller has no deadline (ingestion)
+ENCODER_TIMEOUT_S = 300.0
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """
+    The SentenceTransformer, loaded on first use. Importing torch and
+    transformers dominates cold start, so nothing heavy runs at import.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL)
+    return _model
+
+
+def warm_encoder():
+    """
+    Load the local model, or check the sidecar is reachable.
+    """
+    if ENCODER_URL:
+        import requests
+
+        resp = requests.get(f"{ENCODER_URL.rstrip('/')}/healthz", timeout=30)
+        resp.raise_for_status()
+    else:
+        get_model()
+
+
+def _remote_encode(texts: list, timeout: float = ENCODER_TIMEOUT_S):
+    import requests
+
+    vectors = []
+    for i in range(0, len(texts), ENCODER_REQUEST_SIZE):
+        resp = requests.post(
+            f"{ENCODER_URL.rstrip('/')}/encode",
+            json={"texts": texts[i:i + ENCODER_REQUEST_SIZE]},
+            timeout=timeout
+        )
+        resp.raise_for_status()
+        vectors.extend(resp.json()["embeddings"])
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def encode_texts(texts: list, batch_size: int = 32, show_progress_bar: bool = False,
+                 timeout: float | None = None):
+    """
+    Normalised embeddings, computed locally or by the encoder sidecar.
+
+    With a `timeout` (request path), the sidecar call is bounded by it
+    and a local model that is not loaded yet raises TimeoutError
+    instead of loading inline.
+    """
+    if ENCODER_URL:
+        return _remote_encode(texts, timeout if timeout is not None else ENCODER_TIMEOUT_S)
+    if timeout is not None and _model is None:
+        raise TimeoutError("Embedding model is still loading")
+    return get_model().encode(
+        texts,
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        show_progress_bar=show_progress_bar
+    )
+
+
+# Concurrent requests share batched query-encoding passes
+query_batcher = EmbeddingBatcher(
+    lambda texts: encode_texts(texts, batch_size=len(texts))
+)
 
 RESULT_SECTION_TERMS = [
     "results", "experiments", "evaluation", "findings",
@@ -69,8 +154,11 @@ def build_query_text(structured_query: dict) -> str:
     ).strip()
 
 
-def _load_chunks_from_disk():
-    with open(CHUNK_FILE, encoding="utf-8") as f:
+def _load_chunks_from_disk(collection_id: str = DEFAULT_COLLECTION):
+    chunk_file = collection_paths(collection_id)["chunks"]
+    if not os.path.exists(chunk_file):
+        return []
+    with open(chunk_file, encoding="utf-8") as f:
         return json.load(f)
 
 def _chunks_signature(chunks):
@@ -82,77 +170,290 @@ def _chunks_signature(chunks):
     return hasher.hexdigest()
 
 
-def _compute_and_cache_embeddings(chunks):
-    texts = [f"passage: {c['text']}" for c in chunks]
-    embeddings = model.encode(
-        texts,
-        batch_size=32,
-        normalize_embeddings=True,
-        show_progress_bar=True
-    )
+def _read_meta(paths: dict) -> dict:
+    try:
+        with open(paths["meta"], "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
 
-    np.save(EMBED_FILE, embeddings)
-    with open(META_FILE, "w", encoding="utf-8") as f:
-        json.dump({"signature": _chunks_signature(chunks)}, f)
 
-    return embeddings
+def _write_meta(paths: dict, meta: dict):
+    tmp_path = f"{paths['meta']}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, paths["meta"])
 
 
-def _load_or_create_embeddings(chunks):
+def _load_published(path: str, meta: dict, key: str, signature: str):
+    if meta.get(key) != signature or not os.path.exists(path):
+        return None
+    try:
+        return load_array(path)
+    except Exception:
+        return None
+
+
+def _load_or_create_arrays(chunks, collection_id: str = DEFAULT_COLLECTION):
+    """
+    Corpus embeddings and evidence-boost scores, read from disk when they
+    match the chunks and computed (then published) otherwise. In shared
+    mode one worker builds while the rest wait, then all attach via mmap.
+    """
+    paths = collection_paths(collection_id)
     signature = _chunks_signature(chunks)
 
-    if os.path.exists(EMBED_FILE) and os.path.exists(META_FILE):
-        try:
-            with open(META_FILE, "r", encoding="utf-8") as f:
-                meta = json.load(f)
-            if meta.get("signature") == signature:
-                return np.load(EMBED_FILE)
-        except Exception:
-            pass
+    os.makedirs(paths["root"], exist_ok=True)
+    with publish_lock(paths["root"]) if SHARED_INDEX else nullcontext():
+        meta = _read_meta(paths)
+        changed = False
+
+        embeddings = _load_published(paths["embeddings"], meta, "signature", signature)
+        if embeddings is None:
+            texts = [f"passage: {c['text']}" for c in chunks]
+            save_array(paths["embeddings"], encode_texts(texts, show_progress_bar=True))
+            meta = {"signature": signature}
+            changed = True
+
+        evidence_scores = _load_published(paths["evidence"], meta, "evidence_signature", signature)
+        if evidence_scores is None:
+            scores = np.array(
+                [_evidence_likelihood(c.get("text", "")) for c in chunks],
+                dtype=np.float32
+            )
+            save_array(paths["evidence"], scores)
+            meta["evidence_signature"] = signature
+            changed = True
+
+        if changed:
+            _write_meta(paths, meta)
+            embeddings = load_array(paths["embeddings"])
+            evidence_scores = load_array(paths["evidence"])
+
+    return embeddings, evidence_scores
+
+
+# ---------------- COLLECTION INDEX ----------------
+def _build_index(chunks, collection_id: str = DEFAULT_COLLECTION) -> dict:
+    """
+    Everything retrieval needs that does not depend on the query:
+    embeddings, evidence boosts and per-paper row groups.
+    """
+    if chunks:
+        embeddings, evidence_scores = _load_or_create_arrays(chunks, collection_id)
+    else:
+        embeddings, evidence_scores = None, np.zeros(0, dtype=np.float32)
+
+    groups = defaultdict(list)
+    for idx, chunk in enumerate(chunks):
+        groups[chunk["paper_id"]].append(idx)
+    paper_groups = {pid: np.array(rows, dtype=np.int64) for pid, rows in groups.items()}
+
+    return {
+        "collection_id": collection_id,
+        "signature": _chunks_signature(chunks),
+        "chunks": chunks,
+        "embeddings": embeddings,
+        "evidence_scores": evidence_scores,
+        "paper_groups": paper_groups,
+    }
+
+
+def _deep_sizeof(obj, seen: set) -> int:
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        # getsizeof leaves out memory-mapped and borrowed buffers
+        return max(sys.getsizeof(obj), obj.nbytes)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += _deep_sizeof(k, seen) + _deep_sizeof(v, seen)
+    elif isinstance(obj, (list, tuple, set)):
+        for item in obj:
+            size += _deep_sizeof(item, seen)
+    return size
+
+
+def _index_nbytes(index: dict) -> int:
+    """
+    Resident size of an index, measured once at load time: arrays plus
+    the chunk dicts, their strings and sentence-span lists.
+    """
+    return _deep_sizeof(index, set())
+
 
-    return _compute_and_cache_embeddings(chunks)
+def _load_collection_index(collection_id: str):
+    """
+    Index for an ingested collection, or None when it has no chunks.
+    """
+    mtime = _chunks_mtime(collection_id)
+    chunks = _load_chunks_from_disk(collection_id)
+    if not chunks:
+        return None
+    # Index sentences of older chunk files now, so they are counted below
+    for chunk in chunks:
+        chunk_sentence_index(chunk)
+    index = _build_index(chunks, collection_id)
+    index["chunks_mtime"] = mtime
+    return index
+
+
+index_cache = IndexCache(
+    loader=_load_collection_index,
+    sizer=_index_nbytes,
+    max_bytes=int(INDEX_CACHE_MAX_MB * 1024 * 1024),
+)
+
+
+def _chunks_mtime(collection_id: str):
+    try:
+        return os.path.getmtime(collection_paths(collection_id)["chunks"])
+    except OSError:
+        return None
+
+
+def get_collection_index(collection_id: str = DEFAULT_COLLECTION):
+    """
+    Resident index of a collection, or None if it has no chunks.
+    """
+    index = index_cache.get(collection_id)
+    # Another worker may have re-ingested this collection since we loaded it
+    if index is not None and index.get("chunks_mtime") != _chunks_mtime(collection_id):
+        index_cache.invalidate(collection_id)
+        index = index_cache.get(collection_id)
+    return index
+
+
+def resident_index(collection_id: str = DEFAULT_COLLECTION):
+    """
+    Index of a collection if it is already loaded and current, else None.
+    """
+    index = index_cache.peek(collection_id)
+    if index is None or index.get("chunks_mtime") != _chunks_mtime(collection_id):
+        return None
+    return index
+
+
+def corpus_version(collection_id: str = DEFAULT_COLLECTION):
+    """
+    Signature of the resident index, or None when it is not loaded.
+    Never loads, so callers on the request path stay cheap.
+    """
+    index = resident_index(collection_id)
+    return index["signature"] if index is not None else None
+
+
+def embed_question(question: str, deadline=None):
+    """
+    Normalised embedding of the raw question, for semantic caching.
+    Raises TimeoutError if it is not ready before `deadline`.
+    """
+    timeout = deadline.remaining() if deadline is not None else None
+    return query_batcher.encode(f"query: {question}", timeout=timeout)
+
+
+def invalidate_collection(collection_id: str):
+    index_cache.invalidate(collection_id)
+
+
+def _index_within(collection_id: str, deadline):
+    """
+    Collection index, waiting for a cold load only until `deadline`.
+    The load keeps running in the background and fills the cache for
+    later requests. Returns (index, timed_out).
+    """
+    index = resident_index(collection_id)
+    if index is not None or deadline is None:
+        return (index if index is not None else get_collection_index(collection_id)), False
+
+    loaded = {}
+    loader = threading.Thread(
+        target=lambda: loaded.update(index=get_collection_index(collection_id)),
+        name=f"index-load-{collection_id}",
+        daemon=True
+    )
+    loader.start()
+    loader.join(deadline.remaining())
+    if loader.is_alive():
+        return None, True
+    return loaded.get("index"), False
+
+
+def _lexical_top_k_per_paper(chunks: list, structured_query: dict, k: int) -> dict:
+    """
+    Degraded retrieval without embeddings: query-term overlap plus the
+    same evidence-likelihood boost.
+    """
+    terms = set(re.findall(r"[a-z0-9]+", build_query_text(structured_query).lower()))
+    terms.discard("query")
+
+    groups = defaultdict(list)
+    for chunk in chunks:
+        words = set(re.findall(r"[a-z0-9]+", chunk.get("text", "").lower()))
+        overlap = len(terms & words) / len(terms) if terms else 0.0
+        score = overlap + _evidence_likelihood(chunk.get("text", ""))
+        groups[chunk["paper_id"]].append((score, chunk))
+
+    return {
+        pid: [c for _, c in sorted(scored, key=lambda sc: sc[0], reverse=True)[:k]]
+        for pid, scored in groups.items()
+    }
 
 
 def retrieve_top_k_per_paper(
     structured_query: dict,
     k: int = 3,
-    chunks: list | None = None
+    chunks: list | None = None,
+    collection_id: str = DEFAULT_COLLECTION,
+    deadline=None
 ):
     """
     Retrieve top-k evidence-biased chunks PER paper.
+
+    With a `deadline`, a collection whose index is not resident yet, or
+    a query that cannot be encoded in time, is ranked lexically instead,
+    and `deadline.degraded` is set.
     """
 
     if structured_query is None:
         raise ValueError("structured_query is required")
 
     if chunks is None:
-        chunks = _load_chunks_from_disk()
-
-    if not chunks:
+        index, timed_out = _index_within(collection_id, deadline)
+        if timed_out:
+            print(f"[RETRIEVE] Index for '{collection_id}' not ready in time, ranking lexically")
+            deadline.degraded = True
+            return _lexical_top_k_per_paper(_load_chunks_from_disk(collection_id), structured_query, k)
+    else:
+        index = _build_index(chunks, collection_id)
+
+    if index is None or not index["chunks"]:
         return {}
 
-    embeddings = _load_or_create_embeddings(chunks)
-
     query_text = build_query_text(structured_query)
-    query_embedding = model.encode([query_text], normalize_embeddings=True)
+    if deadline is None:
+        query_embedding = query_batcher.encode(query_text)
+    else:
+        try:
+            query_embedding = query_batcher.encode(query_text, timeout=deadline.remaining())
+        except Exception as e:
+            print(f"[RETRIEVE] Query encoding failed ({e}), ranking lexically")
+            deadline.degraded = True
+            return _lexical_top_k_per_paper(index["chunks"], structured_query, k)
 
-    semantic_scores = cosine_similarity(query_embedding, embeddings)[0]
+    # Both sides are normalised, so the dot product is the cosine similarity
+    semantic_scores = index["embeddings"] @ query_embedding
 
     # --- combine semantic similarity + evidence likelihood ---
-    combined_scores = []
-    for idx, chunk in enumerate(chunks):
-        evidence_boost = _evidence_likelihood(chunk.get("text", ""))
-        combined_scores.append(semantic_scores[idx] + evidence_boost)
-
-    paper_groups = defaultdict(list)
-    for idx, chunk in enumerate(chunks):
-        paper_groups[chunk["paper_id"]].append((idx, chunk))
+    combined_scores = semantic_scores + index["evidence_scores"]
 
     results = {}
-    for paper_id, items in paper_groups.items():
-        indices = [i for i, _ in items]
-        scores = [combined_scores[i] for i in indices]
-        top_pos = np.argsort(scores)[::-1][:k]
-        results[paper_id] = [items[p][1] for p in top_pos]
+    for paper_id, rows in index["paper_groups"].items():
+        top_pos = np.argsort(combined_scores[rows])[::-1][:k]
+        results[paper_id] = [index["chunks"][rows[p]] for p in top_pos]
 
     return results
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from contextlib import nullcontext
+
+# ---------------- CONFIG ----------------
+# Process-wide concurrency limits, shared by every stage of every
+# request running on the same event loop. "cpu" is for batch encoding
+# and similar heavy work; query encoding is bounded by the embedding
+# batcher instead and must not queue here.
+RESOURCE_LIMITS = {
+    "llm": int(os.environ.get("LLM_CONCURRENCY", "4")),
+    "cpu": int(os.environ.get("CPU_CONCURRENCY", "1")),
+}
+
+# asyncio semaphores are bound to one loop, so limiters are kept per loop
+_limiters = weakref.WeakKeyDictionary()  # loop -> {resource: Semaphore}
+_limiters_lock = threading.Lock()
+
+
+def _limiter(resource: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _limiters_lock:
+        per_loop = _limiters.setdefault(loop, {})
+        sem = per_loop.get(resource)
+        if sem is None:
+            sem = per_loop[resource] = asyncio.Semaphore(RESOURCE_LIMITS.get(resource, 1))
+        return sem
+
+
+class TaskScheduler:
+    """
+    Runs a dependency graph of tasks on asyncio.
+
+    A task starts as soon as all of its dependencies have finished, so
+    per-paper chains (extract -> validate -> summarize -> rank) overlap
+    instead of waiting for whole stages. Blocking work goes through
+    `call`, which holds a slot of a process-wide resource while it runs
+    in a worker thread. A failing task only fails the tasks that depend
+    on it; its error is kept in `errors`. Every task and call is
+    recorded in `trace`.
+    """
+
+    def __init__(self):
+        self._tasks = {}     # name -> {"fn", "deps", "stage", "paper_id"}
+        self._futures = {}   # name -> asyncio.Task
+        self._spans = {}     # name -> trace entry of the task
+        self.results = {}
+        self.errors = {}
+        self.trace = []
+        self.started_at = time.monotonic()
+
+    def _now(self) -> float:
+        return round(time.monotonic() - self.started_at, 4)
+
+    def add(self, name: str, fn, deps=(), stage: str | None = None, paper_id: str | None = None):
+        """
+        Register `fn(*dep_results)`, an async callable, as task `name`.
+        """
+        if name in self._tasks:
+            raise ValueError(f"Duplicate task {name!r}")
+        for d in deps:
+            if d not in self._tasks:
+                raise ValueError(f"Task {name!r} depends on unknown task {d!r}")
+        self._tasks[name] = {
+            "fn": fn,
+            "deps": list(deps),
+            "stage": stage or name,
+            "paper_id": paper_id,
+        }
+
+    async def call(self, fn, *args, resource: str | None = "llm", stage: str | None = None,
+                   paper_id: str | None = None, **kwargs):
+        """
+        Run blocking `fn` in a worker thread under a `resource` slot.
+        `resource=None` runs it without taking a slot.
+        """
+        queued = self._now()
+        async with _limiter(resource) if resource else nullcontext():
+            start = self._now()
+            try:
+                return await asyncio.to_thread(fn, *args, **kwargs)
+            finally:
+                self.trace.append({
+                    "kind": "call",
+                    "name": getattr(fn, "__name__", "call"),
+                    "stage": stage,
+                    "paper_id": paper_id,
+                    "resource": resource,
+                    "queued": queued,
+                    "start": start,
+                    "end": self._now(),
+                })
+
+    async def _run_task(self, name: str):
+        task = self._tasks[name]
+        dep_results = []
+        for d in task["deps"]:
+            try:
+                dep_results.append(await self._futures[d])
+            except Exception:
+                self.errors[name] = f"dependency {d!r} failed"
+                raise
+
+        span = {
+            "kind": "task",
+            "name": name,
+            "stage": task["stage"],
+            "paper_id": task["paper_id"],
+            "deps": task["deps"],
+            "start": self._now(),
+            "end": None,
+        }
+        self._spans[name] = span
+        self.trace.append(span)
+        try:
+            result = await task["fn"](*dep_results)
+        except Exception as e:
+            span["error"] = f"{type(e).__name__}: {e}"
+            self.errors[name] = span["error"]
+            print(f"[SCHED][ERROR] Task {name} failed: {span['error']}")
+            raise
+        finally:
+            span["end"] = self._now()
+
+        self.results[name] = result
+        return result
+
+    async def run(self) -> dict:
+        """
+        Run every task added since the last `run`. Tasks may depend on
+        tasks finished in an earlier run, which lets the graph grow once
+        earlier results (e.g. the set of papers) are known. Failed tasks
+        are absent from the results and listed in `errors`.
+        """
+        pending = [n for n in self._tasks if n not in self._futures]
+        for name in pending:
+            self._futures[name] = asyncio.ensure_future(self._run_task(name))
+
+        await asyncio.gather(*(self._futures[n] for n in pending), return_exceptions=True)
+        return self.results
+
+    def critical_path(self) -> dict:
+        """
+        Chain of tasks that determined end-to-end latency: start from the
+        last task to finish and repeatedly step to its latest-finishing
+        dependency.
+        """
+        finished = [s for s in self._spans.values() if s["end"] is not None]
+        if not finished:
+            return {"tasks": [], "duration_s": 0.0}
+
+        path = []
+        span = max(finished, key=lambda s: s["end"])
+        while span is not None:
+            path.append(span["name"])
+            deps = [self._spans[d] for d in span["deps"] if d in self._spans]
+            span = max(deps, key=lambda s: s["end"]) if deps else None
+
+        path.reverse()
+        return {"tasks": path, "duration_s": self._spans[path[-1]]["end"]}
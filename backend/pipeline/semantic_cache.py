@@ -0,0 +1,204 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+# ---------------- CONFIG ----------------
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE", "1") == "1"
+# e5 cosine scores bunch up between 0.7 and 1.0, so questions about the
+# same entities but different metrics can score above 0.92. Re-run
+# scripts/calibrate_threshold.py on labelled question pairs to tune it.
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_CAPACITY = int(os.environ.get("SEMANTIC_CACHE_CAPACITY", "2048"))
+SEMANTIC_CACHE_TTL_S = float(os.environ.get("SEMANTIC_CACHE_TTL_S", "3600"))
+
+# Random-hyperplane LSH. With 8 tables of 8 bits, a neighbour at cosine
+# 0.95 shares a bucket in at least one table ~99% of the time.
+LSH_TABLES = 8
+LSH_BITS = 8
+# Below this many entries a full scan is cheaper than the hash lookup
+EXACT_SCAN_MAX = 256
+
+# Parse fields whose words must appear in a question reusing that parse
+PARSE_KEY_FIELDS = ("model_a", "model_b", "metric", "dataset")
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9.+\-]*")
+
+
+def _key_terms(text: str) -> set:
+    """
+    Tokens that name something specific: numbers, versions and acronyms
+    or CamelCase names (two or more capitals), e.g. GPT-4, F1, ResNet.
+    """
+    return {
+        t.lower().rstrip(".") for t in _TOKEN_RE.findall(text or "")
+        if any(ch.isdigit() for ch in t) or sum(ch.isupper() for ch in t) >= 2
+    }
+
+
+def parse_fits_question(question: str, cached_question: str, structured_query: dict) -> bool:
+    """
+    Whether a parse cached for `cached_question` can answer `question`:
+    every word of its entities, metric and dataset occurs in the new
+    question, and both questions name the same specific terms.
+    Embedding similarity alone does not tell "accuracy" from "F1".
+    """
+    words = {t.lower() for t in re.findall(r"[A-Za-z0-9]+", question or "")}
+    for field in PARSE_KEY_FIELDS:
+        value = structured_query.get(field)
+        if not isinstance(value, str) or not value.strip():
+            continue
+        if not {t.lower() for t in re.findall(r"[A-Za-z0-9]+", value)} <= words:
+            return False
+    return _key_terms(question) == _key_terms(cached_question)
+
+
+class SemanticCache:
+    """
+    Reuses parse + retrieval results for near-duplicate questions.
+
+    Entries are keyed by a normalised question embedding and scoped to a
+    (collection_id, corpus_version) pair, so a re-ingested corpus never
+    serves stale chunks. A similar entry is only reused if its parse
+    fits the new question (see `parse_fits_question`). Eviction is LRU
+    with a TTL.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 capacity: int = SEMANTIC_CACHE_CAPACITY,
+                 ttl_s: float = SEMANTIC_CACHE_TTL_S, seed: int = 0):
+        self.threshold = threshold
+        self.capacity = max(1, capacity)
+        self.ttl_s = ttl_s
+        self._seed = seed
+
+        self._entries = OrderedDict()   # entry_id -> entry
+        self._buckets = defaultdict(set)  # (scope, table, key) -> entry_ids
+        self._scopes = defaultdict(set)   # scope -> entry_ids
+        self._planes = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.rejected = 0
+        self.evictions = 0
+        self._hit_similarity = 0.0
+
+    def _hash_keys(self, vector) -> list:
+        if self._planes is None:
+            rng = np.random.default_rng(self._seed)
+            self._planes = rng.standard_normal((LSH_TABLES, LSH_BITS, vector.shape[0])).astype(np.float32)
+        bits = (self._planes @ vector) > 0
+        weights = 1 << np.arange(LSH_BITS)
+        return [int(k) for k in (bits * weights).sum(axis=1)]
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        for table, key in enumerate(entry["keys"]):
+            bucket = self._buckets[(entry["scope"], table, key)]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[(entry["scope"], table, key)]
+        self._scopes[entry["scope"]].discard(entry_id)
+        if not self._scopes[entry["scope"]]:
+            del self._scopes[entry["scope"]]
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_s
+        while self._entries:
+            entry_id, entry = next(iter(self._entries.items()))
+            if entry["last_used"] >= cutoff:
+                break
+            self._remove(entry_id)
+            self.evictions += 1
+
+    def _candidates(self, scope, vector) -> set:
+        ids = self._scopes.get(scope, set())
+        if len(ids) <= EXACT_SCAN_MAX:
+            return set(ids)
+        found = set()
+        for table, key in enumerate(self._hash_keys(vector)):
+            found |= self._buckets.get((scope, table, key), set())
+        return found
+
+    def lookup(self, vector, collection_id: str, corpus_version: str, question: str | None = None):
+        """
+        Most similar cached entry at or above the threshold whose parse
+        fits `question`, or None.
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        scope = (collection_id, corpus_version)
+
+        with self._lock:
+            self.lookups += 1
+            self._expire()
+
+            ids = list(self._candidates(scope, vector))
+            if not ids:
+                return None
+
+            matrix = np.stack([self._entries[i]["vector"] for i in ids])
+            sims = matrix @ vector
+
+            for pos in np.argsort(sims)[::-1]:
+                if sims[pos] < self.threshold:
+                    break
+                entry = self._entries[ids[pos]]
+                if question is not None and not parse_fits_question(
+                    question, entry["question"], entry["value"].get("structured_query") or {}
+                ):
+                    self.rejected += 1
+                    continue
+
+                entry["last_used"] = time.monotonic()
+                self._entries.move_to_end(ids[pos])
+                self.hits += 1
+                self._hit_similarity += float(sims[pos])
+                return {**entry["value"], "similarity": round(float(sims[pos]), 4)}
+            return None
+
+    def insert(self, vector, collection_id: str, corpus_version: str, value: dict,
+               question: str | None = None):
+        vector = np.asarray(vector, dtype=np.float32)
+        scope = (collection_id, corpus_version)
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            keys = self._hash_keys(vector)
+            self._entries[entry_id] = {
+                "vector": vector,
+                "question": question,
+                "scope": scope,
+                "keys": keys,
+                "value": value,
+                "last_used": time.monotonic(),
+            }
+            for table, key in enumerate(keys):
+                self._buckets[(scope, table, key)].add(entry_id)
+            self._scopes[scope].add(entry_id)
+
+            while len(self._entries) > self.capacity:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            misses = self.lookups - self.hits
+            return {
+                "enabled": SEMANTIC_CACHE_ENABLED,
+                "threshold": self.threshold,
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "misses": misses,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "mean_hit_similarity": round(self._hit_similarity / self.hits, 4) if self.hits else 0.0,
+                "rejected_by_parse_check": self.rejected,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,92 @@
+import re
+from bisect import bisect_left, bisect_right
+
+# Terms that mark a sentence as a candidate claim for fallback extraction.
+# Bit i of a sentence mask is set when EVIDENCE_KEYWORDS[i] occurs in it.
+EVIDENCE_KEYWORDS = [
+    "significant", "no significant", "increased", "decreased", "improved",
+    "worse", "better", "compared to", "compared with", "equivalent",
+    "similar", "performance", "outcome", "grade", "score", "p <", "p =",
+    "odds ratio", "effect size", "confidence interval"
+]
+
+_SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def keyword_mask(sentence: str) -> int:
+    lower = sentence.lower()
+    mask = 0
+    for bit, k in enumerate(EVIDENCE_KEYWORDS):
+        if k in lower:
+            mask |= 1 << bit
+    return mask
+
+
+def joined_sentence_spans(sentences: list) -> list:
+    """
+    [start, end) offsets of each sentence in " ".join(sentences).
+    """
+    spans = []
+    pos = 0
+    for s in sentences:
+        spans.append([pos, pos + len(s)])
+        pos += len(s) + 1
+    return spans
+
+
+def chunk_sentence_index(chunk: dict):
+    """
+    Sentence spans and keyword masks for a chunk.
+
+    Chunks ingested with sentence offsets are used as-is; older chunk
+    files are split once with a regex and the result is memoised on the
+    chunk so later queries hit the index.
+    """
+    spans = chunk.get("sentences")
+    masks = chunk.get("sentence_masks")
+    if spans is not None and masks is not None:
+        return spans, masks
+
+    text = chunk.get("text", "")
+    spans = []
+    pos = 0
+    for m in _SENT_SPLIT_RE.finditer(text):
+        if m.start() > pos:
+            spans.append([pos, m.start()])
+        pos = m.end()
+    if pos < len(text):
+        spans.append([pos, len(text)])
+    masks = [keyword_mask(text[s:e]) for s, e in spans]
+
+    chunk["sentences"] = spans
+    chunk["sentence_masks"] = masks
+    return spans, masks
+
+
+def locate_evidence(evidence: str, chunks: list):
+    """
+    Map an evidence string back to a sentence-aligned span in one of the
+    chunks, for highlighting. Returns None when it cannot be found verbatim.
+    """
+    needle = re.sub(r'\s+', ' ', evidence or "").strip()
+    if not needle:
+        return None
+
+    for chunk in chunks:
+        text = chunk.get("text", "")
+        start = text.find(needle)
+        if start == -1:
+            continue
+        end = start + len(needle)
+
+        spans, _ = chunk_sentence_index(chunk)
+        if spans:
+            starts = [s for s, _ in spans]
+            ends = [e for _, e in spans]
+            first = max(0, bisect_right(starts, start) - 1)
+            last = min(len(spans) - 1, bisect_left(ends, end))
+            start, end = spans[first][0], spans[last][1]
+
+        return {"chunk_id": chunk.get("chunk_id"), "start": start, "end": end}
+
+    return None
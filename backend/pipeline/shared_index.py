@@ -0,0 +1,81 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, workers may duplicate a build
+    fcntl = None
+
+# ---------------- CONFIG ----------------
+# When enabled, corpus arrays are published once as .npy files and every
+# uvicorn worker attaches them read-only with mmap, so the OS page cache
+# holds a single copy however many workers run.
+SHARED_INDEX = os.environ.get("SHARED_INDEX", "0") == "1"
+
+_ingest_locks = {}  # root -> threading.Lock
+_ingest_locks_guard = threading.Lock()
+
+
+@contextmanager
+def publish_lock(root: str):
+    """
+    Cross-process lock so only one worker builds a collection's arrays
+    while the others wait and then attach the published result.
+    """
+    os.makedirs(root, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+
+    with open(os.path.join(root, ".publish.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def ingest_lock(root: str):
+    """
+    Serialises replacing a collection's papers and chunks: across the
+    threads of this process, and across workers where fcntl exists.
+    Separate from `publish_lock`, which is taken inside it.
+    """
+    os.makedirs(root, exist_ok=True)
+    with _ingest_locks_guard:
+        thread_lock = _ingest_locks.setdefault(os.path.abspath(root), threading.Lock())
+
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(root, ".ingest.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def save_array(path: str, array) -> None:
+    """
+    Write atomically, so a worker attaching concurrently never maps a
+    half-written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+
+def load_array(path: str):
+    """
+    Read-only memory map in shared mode, a private copy otherwise.
+    """
+    if SHARED_INDEX:
+        return np.load(path, mmap_mode="r")
+    return np.load(path)
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# ---------------- CONFIG ----------------
+# A failed warm-up step (e.g. the encoder sidecar not listening yet) is
+# retried with exponential backoff between these bounds
+WARMUP_RETRY_BASE_S = float(os.environ.get("WARMUP_RETRY_BASE_S", "1"))
+WARMUP_RETRY_MAX_S = float(os.environ.get("WARMUP_RETRY_MAX_S", "30"))
+
+
+class StartupState:
+    """
+    Tracks cold-start phases and whether the service is ready for traffic.
+
+    Phases run in order on a background thread started after the server
+    is up, so liveness can be answered immediately while models and
+    indexes warm up. A failing phase is retried until it succeeds.
+    """
+
+    def __init__(self, started_at: float | None = None):
+        self.created_at = started_at if started_at is not None else time.monotonic()
+        # Written by the warm-up thread, read by /readyz on the event loop
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.ready = False
+        self.error = None
+        self._thread = None
+
+    @contextmanager
+    def phase(self, name: str):
+        with self._lock:
+            attempts = self.phases.get(name, {}).get("attempts", 0) + 1
+            entry = {
+                "status": "running",
+                "started_s": self._offset(),
+                "duration_s": None,
+                "attempts": attempts
+            }
+            self.phases[name] = entry
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            with self._lock:
+                entry["status"] = "failed"
+                entry["error"] = str(e)
+            raise
+        else:
+            with self._lock:
+                entry["status"] = "done"
+        finally:
+            with self._lock:
+                entry["duration_s"] = round(time.monotonic() - start, 3)
+            print(f"[STARTUP] {name}: {entry['status']} in {entry['duration_s']}s (attempt {attempts})")
+
+    def record(self, name: str, started_at: float, ended_at: float):
+        """
+        Record a phase that was timed outside this object (e.g. imports).
+        """
+        with self._lock:
+            self.phases[name] = {
+                "status": "done",
+                "started_s": round(started_at - self.created_at, 3),
+                "duration_s": round(ended_at - started_at, 3),
+            }
+
+    def _offset(self) -> float:
+        return round(time.monotonic() - self.created_at, 3)
+
+    def start_warmup(self, steps: list):
+        """
+        Run `steps`, a list of (phase_name, fn), in a background thread.
+        A failing step is retried with capped exponential backoff; the
+        service becomes ready once all of them succeed.
+        """
+        def run():
+            for name, fn in steps:
+                delay = WARMUP_RETRY_BASE_S
+                while True:
+                    try:
+                        with self.phase(name):
+                            fn()
+                        break
+                    except Exception as e:
+                        with self._lock:
+                            self.error = f"{name}: {e}"
+                        print(f"[STARTUP][ERROR] {name} failed, retrying in {delay:.1f}s: {e}")
+                        time.sleep(delay)
+                        delay = min(delay * 2, WARMUP_RETRY_MAX_S)
+            with self._lock:
+                self.error = None
+                self.ready = True
+            print(f"[STARTUP] Ready after {self._offset()}s")
+
+        self._thread = threading.Thread(target=run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def report(self) -> dict:
+        """
+        Snapshot safe to serialise while warm-up is still running.
+        """
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "error": self.error,
+                "uptime_s": self._offset(),
+                "phases": {name: dict(entry) for name, entry in self.phases.items()},
+            }
@@ -0,0 +1,89 @@
+"""
+Pick a cosine threshold for the semantic cache or claim dedup from
+labelled text pairs.
+
+Each line of the input is {"a": ..., "b": ..., "same": true|false}:
+`same` marks pairs that may share a cache entry (paraphrased questions)
+or be merged (restated claims). Run from backend/:
+
+    python -m scripts.calibrate_threshold question_pairs.jsonl
+    python -m scripts.calibrate_threshold claim_pairs.jsonl --target-precision 0.99
+
+The suggested threshold is the lowest one whose precision on the pairs
+reaches --target-precision; set it as SEMANTIC_CACHE_THRESHOLD or
+CLAIM_DEDUP_THRESHOLD.
+"""
+import argparse
+import json
+
+import numpy as np
+
+from pipeline.retrieval import encode_texts
+
+
+def load_pairs(path: str) -> list:
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                pairs.append((entry["a"], entry["b"], bool(entry["same"])))
+    if not pairs:
+        raise ValueError(f"No pairs found in {path}")
+    return pairs
+
+
+def pair_similarities(pairs: list) -> np.ndarray:
+    a = encode_texts([f"query: {p[0]}" for p in pairs])
+    b = encode_texts([f"query: {p[1]}" for p in pairs])
+    return np.sum(np.asarray(a) * np.asarray(b), axis=1)
+
+
+def sweep(sims: np.ndarray, labels: np.ndarray, start: float = 0.80, stop: float = 0.995,
+          step: float = 0.005) -> list:
+    rows = []
+    for threshold in np.arange(start, stop + 1e-9, step):
+        predicted = sims >= threshold
+        tp = int(np.sum(predicted & labels))
+        fp = int(np.sum(predicted & ~labels))
+        fn = int(np.sum(~predicted & labels))
+        rows.append({
+            "threshold": round(float(threshold), 3),
+            "precision": round(tp / (tp + fp), 4) if tp + fp else 1.0,
+            "recall": round(tp / (tp + fn), 4) if tp + fn else 0.0,
+            "false_positives": fp,
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate a cosine-similarity threshold")
+    parser.add_argument("pairs", help="JSONL of {a, b, same} pairs")
+    parser.add_argument("--target-precision", type=float, default=1.0)
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.pairs)
+    sims = pair_similarities(pairs)
+    labels = np.array([p[2] for p in pairs])
+
+    same, different = sims[labels], sims[~labels]
+    print(f"[CALIBRATE] {len(pairs)} pairs: {len(same)} same, {len(different)} different")
+    if len(same):
+        print(f"[CALIBRATE] same:      min={same.min():.3f} median={np.median(same):.3f}")
+    if len(different):
+        print(f"[CALIBRATE] different: median={np.median(different):.3f} max={different.max():.3f}")
+
+    rows = sweep(sims, labels)
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>7} {'fp':>4}")
+    for row in rows:
+        print(f"{row['threshold']:>9.3f} {row['precision']:>9.4f} {row['recall']:>7.4f} "
+              f"{row['false_positives']:>4}")
+
+    ok = [row for row in rows if row["precision"] >= args.target_precision and row["recall"] > 0]
+    if ok:
+        best = ok[0]
+        print(f"[CALIBRATE] Suggested threshold {best['threshold']} "
+              f"(precision {best['precision']}, recall {best['recall']})")
+    else:
+        print(f"[CALIBRATE] No threshold reaches precision {args.target_precision}")
@@ -0,0 +1,57 @@
+"""
+Single encoder process shared by every uvicorn worker.
+
+Holds the only copy of the embedding model. Workers started with
+ENCODER_URL send their query and corpus encoding here, and concurrent
+single-text requests from all workers are micro-batched together.
+
+    python -m scripts.encoder_sidecar --port 8100
+    ENCODER_URL=http://127.0.0.1:8100 SHARED_INDEX=1 WEB_CONCURRENCY=4 python server.py
+"""
+import argparse
+import os
+from typing import List
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+# The sidecar is the encoder; it must load the model itself
+os.environ.pop("ENCODER_URL", None)
+
+from pipeline.retrieval import EMBEDDING_MODEL, encode_texts, query_batcher  # noqa: E402
+
+app = FastAPI(title="Embedding encoder sidecar")
+
+
+class EncodeInput(BaseModel):
+    texts: List[str]
+
+
+@app.post("/encode")
+def encode(payload: EncodeInput):
+    if len(payload.texts) == 1:
+        vectors = [query_batcher.encode(payload.texts[0])]
+    else:
+        vectors = encode_texts(payload.texts)
+    return {"embeddings": [v.tolist() for v in vectors]}
+
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok", "model": EMBEDDING_MODEL}
+
+
+@app.get("/metrics")
+def metrics():
+    return {"embedding_batcher": query_batcher.stats()}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Shared embedding encoder")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.port)
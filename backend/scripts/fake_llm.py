@@ -0,0 +1,157 @@
+"""
+Local stand-in for the Groq chat-completions API, for load testing.
+
+Answers every pipeline prompt with well-formed JSON after a sampled
+delay. Point the backend at it with GROQ_BASE_URL:
+
+    python -m scripts.fake_llm --port 9000 \
+        --latency default=lognormal:0.4,0.5 --latency extract=uniform:1.0,2.5
+    GROQ_BASE_URL=http://127.0.0.1:9000 python server.py
+
+Latency specs (seconds): fixed:S, uniform:LO,HI, lognormal:MEDIAN,SIGMA.
+Keys are a prompt kind (parse, extract, validate, summarize, rank) or
+`default`.
+"""
+import argparse
+import asyncio
+import math
+import random
+import re
+import time
+import uuid
+from collections import defaultdict
+
+from fastapi import FastAPI, Request
+
+# Marker text identifying which pipeline prompt a request carries
+PROMPT_KINDS = [
+    ("parse", "query parser"),
+    ("extract", "claim extraction assistant"),
+    ("validate", "claim relevance filter"),
+    ("summarize", "research writing assistant"),
+    ("rank", "ranking extracted claims"),
+]
+
+LATENCY = {"default": ("fixed", (0.3,))}
+
+app = FastAPI(title="Fake LLM")
+
+_stats = {
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "calls": defaultdict(int),
+    "latency_s": defaultdict(float),
+}
+
+
+def parse_latency(spec: str):
+    kind, _, params = spec.partition(":")
+    values = tuple(float(v) for v in params.split(",") if v)
+    expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+    if kind not in expected or len(values) != expected[kind]:
+        raise ValueError(f"Bad latency spec {spec!r}")
+    return kind, values
+
+
+def sample_latency(prompt_kind: str) -> float:
+    dist, params = LATENCY.get(prompt_kind, LATENCY["default"])
+    if dist == "fixed":
+        return params[0]
+    if dist == "uniform":
+        return random.uniform(*params)
+    median, sigma = params
+    return random.lognormvariate(math.log(median), sigma)
+
+
+def prompt_kind(prompt: str) -> str:
+    for kind, marker in PROMPT_KINDS:
+        if marker in prompt:
+            return kind
+    return "default"
+
+
+def fake_content(kind: str, prompt: str) -> str:
+    if kind == "parse":
+        return (
+            '{"model_a": "online learning", "model_b": "face-to-face learning", '
+            '"task": "academic performance", "metric": "grades", '
+            '"dataset": null, "scope": null}'
+        )
+    if kind == "extract":
+        return (
+            '{"claims": ['
+            '{"claim": "Method A improved performance compared to method B.", '
+            '"evidence": "Method A performed better than method B on the evaluation."}, '
+            '{"claim": "No significant difference was found in outcomes.", '
+            '"evidence": "There was no significant difference in outcomes (p = 0.4)."}'
+            ']}'
+        )
+    if kind == "validate":
+        return '{"is_valid": true, "reason": "fake"}'
+    if kind == "summarize":
+        return '{"summary": "The evidence reports a measured difference in outcomes."}'
+    if kind == "rank":
+        n = len(re.findall(r"^\d+\. ", prompt, flags=re.M))
+        return '{"ranking": [%s]}' % ", ".join(str(i + 1) for i in range(n))
+    return "{}"
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+    kind = prompt_kind(prompt)
+
+    _stats["in_flight"] += 1
+    _stats["max_in_flight"] = max(_stats["max_in_flight"], _stats["in_flight"])
+    delay = sample_latency(kind)
+    try:
+        await asyncio.sleep(delay)
+    finally:
+        _stats["in_flight"] -= 1
+    _stats["calls"][kind] += 1
+    _stats["latency_s"][kind] += delay
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": fake_content(kind, prompt)},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "in_flight": _stats["in_flight"],
+        "max_in_flight": _stats["max_in_flight"],
+        "calls": dict(_stats["calls"]),
+        "mean_latency_s": {
+            k: round(_stats["latency_s"][k] / n, 4) for k, n in _stats["calls"].items() if n
+        },
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Groq-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument(
+        "--latency", action="append", default=[],
+        help="KIND=SPEC, e.g. extract=lognormal:1.2,0.4 (repeatable)"
+    )
+    args = parser.parse_args()
+
+    for item in args.latency:
+        key, _, spec = item.rpartition("=")
+        LATENCY[key or "default"] = parse_latency(spec)
+
+    uvicorn.run(app, host=args.host, port=args.port)
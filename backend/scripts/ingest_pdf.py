@@ -1,11 +1,13 @@
 import os
 import re
+import sys
 import json
 from pypdf import PdfReader
 from nltk.tokenize import sent_tokenize
 
-PDF_DIR = "data/papers"
-CHUNK_FILE = "data/processed_chunks.json"
+from pipeline.corpus_store import DEFAULT_COLLECTION, collection_paths
+from pipeline.shared_index import ingest_lock
+from pipeline.sentence_index import joined_sentence_spans, keyword_mask
 
 WINDOW_SENTENCES = 6
 STRIDE_SENTENCES = 3
@@ -32,7 +34,13 @@ def extract_text_from_pdf(path: str) -> str:
 
 
 def sliding_window_chunks(text: str):
+    """
+    Overlapping sentence windows. Each chunk keeps the offsets of its
+    sentences and their evidence-keyword masks, so query-time fallback
+    extraction and highlighting need no re-splitting.
+    """
     sentences = sent_tokenize(text)
+    masks = [keyword_mask(s) for s in sentences]
     chunks = []
 
     i = 0
@@ -41,22 +49,30 @@ def sliding_window_chunks(text: str):
         chunk = " ".join(window)
 
         if len(chunk) >= MIN_CHARS:
-            chunks.append(chunk)
+            chunks.append({
+                "text": chunk,
+                "sentences": joined_sentence_spans(window),
+                "sentence_masks": masks[i:i + WINDOW_SENTENCES]
+            })
 
         i += STRIDE_SENTENCES
 
     return chunks
 
 
-def ingest_pdfs():
+def ingest_pdfs(collection_id: str = DEFAULT_COLLECTION):
+    paths = collection_paths(collection_id)
+    pdf_dir = paths["papers"]
+    chunk_file = paths["chunks"]
+
     all_chunks = []
     chunk_id = 0
 
-    for filename in os.listdir(PDF_DIR):
+    for filename in os.listdir(pdf_dir):
         if not filename.lower().endswith(".pdf"):
             continue
 
-        pdf_path = os.path.join(PDF_DIR, filename)
+        pdf_path = os.path.join(pdf_dir, filename)
         print(f"[INGEST] Processing {filename}")
 
         text = extract_text_from_pdf(pdf_path)
@@ -66,15 +82,22 @@ def ingest_pdfs():
             all_chunks.append({
                 "paper_id": filename,
                 "chunk_id": f"{filename}_{chunk_id}",
-                "text": chunk
+                **chunk
             })
             chunk_id += 1
 
-    with open(CHUNK_FILE, "w", encoding="utf-8") as f:
+    # Atomic replace: other workers reload on mtime change and must never
+    # read a half-written file
+    tmp_file = f"{chunk_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
         json.dump(all_chunks, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, chunk_file)
 
-    print(f"[INGEST] Saved {len(all_chunks)} chunks → {CHUNK_FILE}")
+    print(f"[INGEST] Saved {len(all_chunks)} chunks → {chunk_file}")
 
 
 if __name__ == "__main__":
-    ingest_pdfs()
+    # Run from backend/: python -m scripts.ingest_pdf [collection_id]
+    collection_id = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_COLLECTION
+    with ingest_lock(collection_paths(collection_id)["root"]):
+        ingest_pdfs(collection_id)
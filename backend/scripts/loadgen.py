@@ -0,0 +1,288 @@
+"""
+Replay a recorded /analyze trace against a running server and report
+throughput, latency percentiles and a per-stage breakdown.
+
+Record a trace by starting the server with ANALYZE_TRACE_FILE=trace.jsonl,
+then replay it (run from backend/):
+
+    python -m scripts.loadgen trace.jsonl --mode open --qps 2 --duration 60
+    python -m scripts.loadgen trace.jsonl --mode closed --concurrency 8 --requests 200
+
+Open loop sends requests on a Poisson schedule at --qps regardless of
+how fast the server answers; its sender pool is sized from
+qps * timeout (or --max-in-flight) and a warning is printed if sends
+ever queue behind it. Closed loop keeps --concurrency requests in
+flight at all times. Pair with scripts/fake_llm.py to take the real
+LLM out of the measurement.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def load_trace(path: str) -> list:
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry.get("question"):
+                entries.append(entry)
+    if not entries:
+        raise ValueError(f"No questions found in {path}")
+    return entries
+
+
+def _percentiles(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))], 4)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 4),
+    }
+
+
+class LoadGenerator:
+    def __init__(self, url: str, trace: list, deadline_s: float | None, timeout_s: float):
+        self.url = url.rstrip("/") + "/analyze/invoke"
+        self.trace = trace
+        self.deadline_s = deadline_s
+        self.timeout_s = timeout_s
+
+        self._lock = threading.Lock()
+        self._next = 0
+        self._in_flight = 0
+        self.results = []
+        # Open-loop sends that found every sender busy
+        self.queued_sends = 0
+
+    def _next_entry(self) -> dict:
+        with self._lock:
+            entry = self.trace[self._next % len(self.trace)]
+            self._next += 1
+            return entry
+
+    def send_one(self, scheduled_at: float | None = None):
+        """
+        Send one request. Open loop passes its scheduled arrival time, so
+        any wait for a free sender counts towards latency.
+        """
+        entry = self._next_entry()
+        payload = {
+            "question": entry["question"],
+            "collection_id": entry.get("collection_id") or "default",
+        }
+        deadline_s = self.deadline_s or entry.get("deadline_s")
+        if deadline_s:
+            payload["deadline_s"] = deadline_s
+
+        start = scheduled_at if scheduled_at is not None else time.monotonic()
+        result = {"ok": False}
+        try:
+            resp = requests.post(self.url, json={"input": payload}, timeout=self.timeout_s)
+            result["status"] = resp.status_code
+            if resp.ok:
+                output = resp.json().get("output", {})
+                result["ok"] = output.get("stage") != "error"
+                result["output"] = output
+        except requests.RequestException as e:
+            result["error"] = str(e)
+        result["latency_s"] = time.monotonic() - start
+
+        with self._lock:
+            self.results.append(result)
+            self._in_flight -= 1
+
+    def run_open(self, qps: float, duration_s: float | None, total: int | None,
+                 max_in_flight: int | None = None):
+        """
+        Poisson arrivals at `qps`; sends are never held back by slow responses.
+
+        By Little's law at most qps * timeout requests are in flight, so
+        the pool is sized from that unless `max_in_flight` caps it. Sends
+        that still find every sender busy are counted in `queued_sends`.
+        """
+        workers = max_in_flight or max(1, math.ceil(qps * self.timeout_s * 1.2))
+        print(f"[LOADGEN] Open loop with up to {workers} requests in flight")
+        started = time.monotonic()
+        sent = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            next_at = started
+            while True:
+                if total is not None and sent >= total:
+                    break
+                if duration_s is not None and time.monotonic() - started >= duration_s:
+                    break
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                with self._lock:
+                    if self._in_flight >= workers:
+                        if not self.queued_sends:
+                            print(f"[LOADGEN][WARN] All {workers} senders busy; sends are queueing "
+                                  f"and the load is no longer open-loop")
+                        self.queued_sends += 1
+                    self._in_flight += 1
+                pool.submit(self.send_one, next_at)
+                sent += 1
+                next_at += random.expovariate(qps)
+        return time.monotonic() - started
+
+    def run_closed(self, concurrency: int, duration_s: float | None, total: int | None):
+        """
+        `concurrency` workers, each sending its next request when the last returns.
+        """
+        started = time.monotonic()
+        budget = {"left": total}
+        budget_lock = threading.Lock()
+
+        def worker():
+            while True:
+                if duration_s is not None and time.monotonic() - started >= duration_s:
+                    return
+                with budget_lock:
+                    if budget["left"] is not None:
+                        if budget["left"] <= 0:
+                            return
+                        budget["left"] -= 1
+                with self._lock:
+                    self._in_flight += 1
+                self.send_one()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.monotonic() - started
+
+
+def build_report(results: list, wall_s: float, queued_sends: int = 0) -> dict:
+    ok = [r for r in results if r["ok"]]
+    failed = [r for r in results if not r["ok"]]
+
+    stage_task_s = defaultdict(list)
+    stage_call_s = defaultdict(list)
+    stage_queue_s = defaultdict(list)
+    critical_stages = defaultdict(int)
+    degraded = defaultdict(int)
+
+    for r in ok:
+        output = r.get("output", {})
+        for stage in output.get("degraded_stages", []):
+            degraded[stage] += 1
+
+        trace = output.get("trace", {})
+        for span in trace.get("spans", []):
+            if span.get("end") is None:
+                continue
+            stage = span.get("stage") or span.get("name")
+            if span.get("kind") == "task":
+                stage_task_s[stage].append(span["end"] - span["start"])
+            else:
+                stage_call_s[stage].append(span["end"] - span["start"])
+                stage_queue_s[stage].append(span["start"] - span["queued"])
+
+        for name in trace.get("critical_path", {}).get("tasks", []):
+            critical_stages[name.split(":", 1)[0]] += 1
+
+    return {
+        "requests": len(results),
+        "succeeded": len(ok),
+        "failed": len(failed),
+        "queued_sends": queued_sends,
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(ok) / wall_s, 3) if wall_s > 0 else 0.0,
+        # Over every request, so timeouts and errors are not hidden
+        "latency_s": _percentiles([r["latency_s"] for r in results]),
+        "latency_ok_s": _percentiles([r["latency_s"] for r in ok]),
+        "latency_failed_s": _percentiles([r["latency_s"] for r in failed]),
+        "stages": {
+            stage: {
+                "task_s": _percentiles(stage_task_s[stage]),
+                "call_s": _percentiles(stage_call_s[stage]),
+                "queue_wait_s": _percentiles(stage_queue_s[stage]),
+                "on_critical_path": critical_stages.get(stage, 0),
+                "degraded": degraded.get(stage, 0),
+            }
+            for stage in sorted(set(stage_task_s) | set(stage_call_s) | set(degraded))
+        },
+    }
+
+
+def print_report(report: dict):
+    print(f"[LOADGEN] {report['succeeded']}/{report['requests']} ok in {report['wall_s']}s "
+          f"→ {report['throughput_rps']} req/s")
+    for label, key in (("all", "latency_s"), ("ok", "latency_ok_s"), ("failed", "latency_failed_s")):
+        lat = report[key]
+        if lat.get("count"):
+            print(f"[LOADGEN] latency ({label}) p50={lat['p50']}s p95={lat['p95']}s "
+                  f"p99={lat['p99']}s max={lat['max']}s")
+    if report["queued_sends"]:
+        print(f"[LOADGEN][WARN] {report['queued_sends']} sends waited for a free sender")
+
+    print(f"{'stage':<10} {'task p50':>9} {'task p99':>9} {'call p50':>9} "
+          f"{'queue p50':>10} {'queue p99':>10} {'crit':>5} {'degr':>5}")
+    for stage, s in report["stages"].items():
+        def fmt(d, key):
+            return f"{d[key]:.3f}" if d.get("count") else "-"
+        print(f"{stage:<10} {fmt(s['task_s'], 'p50'):>9} {fmt(s['task_s'], 'p99'):>9} "
+              f"{fmt(s['call_s'], 'p50'):>9} {fmt(s['queue_wait_s'], 'p50'):>10} "
+              f"{fmt(s['queue_wait_s'], 'p99'):>10} {s['on_critical_path']:>5} {s['degraded']:>5}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay /analyze traffic and report latency")
+    parser.add_argument("trace", help="JSONL trace recorded via ANALYZE_TRACE_FILE")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mode", choices=["open", "closed"], default="closed")
+    parser.add_argument("--qps", type=float, default=1.0, help="open-loop arrival rate")
+    parser.add_argument("--concurrency", type=int, default=4, help="closed-loop in-flight requests")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="open-loop sender cap (default: qps * timeout * 1.2)")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=None, help="total requests to send")
+    parser.add_argument("--deadline-s", type=float, default=None, help="override per-request deadline")
+    parser.add_argument("--timeout", type=float, default=300.0, help="client-side HTTP timeout")
+    parser.add_argument("--shuffle", action="store_true")
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    if args.duration is None and args.requests is None:
+        args.requests = 50
+
+    trace = load_trace(args.trace)
+    if args.shuffle:
+        random.shuffle(trace)
+
+    gen = LoadGenerator(args.url, trace, args.deadline_s, args.timeout)
+    if args.mode == "open":
+        wall_s = gen.run_open(args.qps, args.duration, args.requests, args.max_in_flight)
+    else:
+        wall_s = gen.run_closed(args.concurrency, args.duration, args.requests)
+
+    report = build_report(gen.results, wall_s, gen.queued_sends)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[LOADGEN] Report → {args.output}")
@@ -1,9 +1,17 @@
 import os
+import json
+import time
 import shutil
-from typing import List
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
-from fastapi import FastAPI, UploadFile, File
+_IMPORTS_STARTED = time.monotonic()
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 from langserve import add_routes
@@ -11,13 +19,73 @@ from langchain_core.runnables import RunnableLambda
 
 # --- PIPELINE IMPORTS ---
 from pipeline.query_parser import parse_query
-from pipeline.retrieval import retrieve_top_k_per_paper
+from pipeline.retrieval import (
+    retrieve_top_k_per_paper,
+    invalidate_collection,
+    index_cache,
+    query_batcher,
+    corpus_version,
+    embed_question,
+    encode_texts,
+    get_collection_index,
+    warm_encoder,
+)
+from pipeline.corpus_store import (
+    DEFAULT_COLLECTION,
+    collection_exists,
+    collection_paths,
+    list_collections,
+    validate_collection_id,
+)
 from pipeline.claim_extraction import extract_claims_per_paper
+from pipeline.claim_dedup import dedupe_claims, CLAIM_DEDUP_ENABLED
 from pipeline.claim_validation import validate_claim
 from pipeline.claim_summarizer import summarize_claims
 from pipeline.claim_ranker import rank_claims
-
-app = FastAPI(title="Comparative Research Evidence Engine")
+from pipeline.deadline import RequestBudget
+from pipeline.shared_index import ingest_lock, publish_lock
+from pipeline.scheduler import TaskScheduler
+from pipeline.semantic_cache import SemanticCache, SEMANTIC_CACHE_ENABLED
+from pipeline.llm_client import get_client
+from pipeline.startup import StartupState
+
+startup_state = StartupState(started_at=_IMPORTS_STARTED)
+startup_state.record("imports", _IMPORTS_STARTED, time.monotonic())
+
+# Collections whose indexes are loaded before reporting ready
+WARM_COLLECTIONS = [
+    c for c in os.environ.get("WARM_COLLECTIONS", DEFAULT_COLLECTION).split(",") if c
+]
+
+
+def _warmup_steps() -> list:
+    steps = [
+        ("llm_client", get_client),
+        ("encoder", warm_encoder),
+        ("query_encoder", lambda: query_batcher.encode("query: warm-up")),
+    ]
+    available = list_collections()
+    for collection_id in WARM_COLLECTIONS:
+        if collection_id in available:
+            steps.append((
+                f"index:{collection_id}",
+                lambda cid=collection_id: get_collection_index(cid)
+            ))
+    return steps
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm up in the background so the port is bound straight away;
+    # /readyz reports when the model and indexes are loaded.
+    startup_state.start_warmup(_warmup_steps())
+    yield
+
+
+app = FastAPI(title="Comparative Research Evidence Engine", lifespan=lifespan)
+
+# Parse + retrieval results of recent questions, reused for near-duplicates
+semantic_cache = SemanticCache()
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,9 +101,31 @@ app.add_middleware(
 # ---------------- INPUT SCHEMA ----------------
 class ResearchInput(BaseModel):
     question: str
+    collection_id: str = DEFAULT_COLLECTION
+    deadline_s: Optional[float] = None
 
 
 # ---------------- UTILS ----------------
+# When set, every /analyze input is appended to this JSONL file so the
+# traffic can be replayed with scripts/loadgen.py
+ANALYZE_TRACE_FILE = os.environ.get("ANALYZE_TRACE_FILE")
+_trace_lock = threading.Lock()
+
+
+def record_request(payload: dict):
+    if not ANALYZE_TRACE_FILE:
+        return
+    entry = {
+        "ts": time.time(),
+        "question": payload.get("question"),
+        "collection_id": payload.get("collection_id") or DEFAULT_COLLECTION,
+        "deadline_s": payload.get("deadline_s"),
+    }
+    with _trace_lock:
+        with open(ANALYZE_TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
 def load_prompts():
     with open("prompts/parse_query.txt", encoding="utf-8") as f:
         parse_p = f.read()
@@ -71,100 +161,362 @@ def compute_graph_stats(claims_dict: dict) -> dict:
 
 
 # ---------------- PIPELINE ----------------
-def run_pipeline(payload) -> dict:
+def _is_kept(verdict) -> bool:
+    if isinstance(verdict, dict) and verdict.get("is_valid") is True:
+        return True
+    return verdict is True or verdict is None
+
+
+PAPER_STAGES = ("extract", "dedup", "validate", "summarize", "rank")
+
+
+def _add_paper_tasks(sched, budget, paper_id, chunks, question, structured_query, prompts, dedup_stats):
+    """
+    Per-paper chain: extract -> dedup -> validate -> summarize -> rank.
+    Each paper moves to its next stage as soon as its own previous one ends.
+    """
+    _, extract_p, validate_p, rank_p = prompts
+
+    async def extract():
+        deadline = budget.stage("extract")
+        extracted = await sched.call(
+            extract_claims_per_paper,
+            retrieved_chunks={paper_id: chunks},
+            structured_query=structured_query,
+            prompt_template=extract_p,
+            question=question,
+            deadline=deadline,
+            stage="extract",
+            paper_id=paper_id
+        )
+        if deadline.degraded:
+            budget.mark_degraded("extract")
+        return extracted.get(paper_id, {}).get("claims", [])
+
+    async def dedup(raw_claims):
+        if not CLAIM_DEDUP_ENABLED:
+            return raw_claims
+        deadline = budget.stage("dedup")
+
+        def encode(texts):
+            return encode_texts(texts, timeout=deadline.timeout())
+
+        kept, stats = await sched.call(
+            dedupe_claims, raw_claims, encode, deadline=deadline,
+            resource="cpu", stage="dedup", paper_id=paper_id
+        )
+        if deadline.degraded:
+            budget.mark_degraded("dedup")
+        dedup_stats[paper_id] = stats
+        return kept
+
+    async def validate(raw_claims):
+        deadline = budget.stage("validate")
+        verdicts = await asyncio.gather(*(
+            sched.call(
+                validate_claim,
+                question=question,
+                structured_query=structured_query,
+                claim=claim,
+                prompt_template=validate_p,
+                deadline=deadline,
+                stage="validate",
+                paper_id=paper_id
+            )
+            for claim in raw_claims
+        ))
+        if deadline.degraded:
+            budget.mark_degraded("validate")
+        return [c for c, v in zip(raw_claims, verdicts) if _is_kept(v)]
+
+    async def summarize(valid):
+        deadline = budget.stage("summarize")
+        summarized = await asyncio.gather(*(
+            sched.call(summarize_claims, [claim], deadline=deadline,
+                       stage="summarize", paper_id=paper_id)
+            for claim in valid
+        ))
+        if deadline.degraded:
+            budget.mark_degraded("summarize")
+        return [c for group in summarized for c in group]
+
+    async def rank(summarized):
+        if not summarized:
+            return {"claims": []}
+        deadline = budget.stage("rank")
+        ranked = await sched.call(
+            rank_claims,
+            question=question,
+            claims=summarized,
+            prompt_template=rank_p,
+            deadline=deadline,
+            stage="rank",
+            paper_id=paper_id
+        )
+        if deadline.degraded:
+            budget.mark_degraded("rank")
+        return {"claims": ranked[:3]}
+
+    sched.add(f"extract:{paper_id}", extract, deps=["retrieve"], stage="extract", paper_id=paper_id)
+    sched.add(f"dedup:{paper_id}", dedup, deps=[f"extract:{paper_id}"], stage="dedup", paper_id=paper_id)
+    sched.add(f"validate:{paper_id}", validate, deps=[f"dedup:{paper_id}"], stage="validate", paper_id=paper_id)
+    sched.add(f"summarize:{paper_id}", summarize, deps=[f"validate:{paper_id}"], stage="summarize", paper_id=paper_id)
+    sched.add(f"rank:{paper_id}", rank, deps=[f"summarize:{paper_id}"], stage="rank", paper_id=paper_id)
+
+
+async def arun_pipeline(payload) -> dict:
     if isinstance(payload, BaseModel):
         payload = payload.dict()
+    record_request(payload)
 
     question = payload.get("question")
     if not question:
         return {"stage": "error", "claims": {}, "graph_stats": {"data": [], "y_max": 0}}
 
-    parse_p, extract_p, validate_p, rank_p = load_prompts()
+    collection_id = payload.get("collection_id") or DEFAULT_COLLECTION
+    try:
+        validate_collection_id(collection_id)
+    except ValueError as e:
+        return {"stage": "error", "error": str(e), "claims": {}, "graph_stats": {"data": [], "y_max": 0}}
+    # Checked before any cache is touched, so unknown ids cost nothing
+    if not collection_exists(collection_id):
+        return {
+            "stage": "error",
+            "error": f"Unknown collection {collection_id!r}",
+            "claims": {},
+            "graph_stats": {"data": [], "y_max": 0}
+        }
+
+    budget = RequestBudget(payload.get("deadline_s"))
+    prompts = load_prompts()
+    sched = TaskScheduler()
+
+    # 0. Semantic cache
+    async def lookup():
+        if not SEMANTIC_CACHE_ENABLED:
+            return None
+        # Only a resident index has a version; a cold collection skips the
+        # cache rather than loading inside the lookup
+        version = corpus_version(collection_id)
+        if version is None:
+            return None
+        try:
+            # Bounded by the embedding batcher, not a cpu slot, and by the
+            # parse share of the budget that a hit would save
+            vector = await sched.call(embed_question, question, deadline=budget.stage("parse"),
+                                      resource=None, stage="cache")
+        except Exception as e:
+            # The cache is an optimisation; answer without it
+            print(f"[CACHE][ERROR] {e}")
+            return None
+        return {
+            "vector": vector,
+            "version": version,
+            "hit": semantic_cache.lookup(vector, collection_id, version, question=question)
+        }
 
     # 1. Parse
-    structured_query = parse_query(question, parse_p)
-    if structured_query.get("error"):
-        return {"stage": "error", "claims": {}, "graph_stats": {"data": [], "y_max": 0}}
+    async def parse(cached):
+        if cached and cached["hit"]:
+            return cached["hit"]["structured_query"]
+        try:
+            return await sched.call(parse_query, question, prompts[0],
+                                    deadline=budget.stage("parse"), stage="parse")
+        except Exception as e:
+            # Degrade to retrieving on the raw question
+            print(f"[PARSE][ERROR] {e}")
+            budget.mark_degraded("parse")
+            return {
+                "model_a": None,
+                "model_b": None,
+                "task": question,
+                "metric": None,
+                "dataset": None,
+                "scope": None
+            }
 
     # 2. Retrieve
-    retrieved = retrieve_top_k_per_paper(structured_query=structured_query, k=6)
-    
-    # 3. Extract
-    extracted_claims = extract_claims_per_paper(
-        retrieved_chunks=retrieved,
-        structured_query=structured_query,
-        prompt_template=extract_p,
-        question=question
-    )
-    
-    # 4. Validate + rank
-    validated_claims = {}
-
-    for paper_id, data in extracted_claims.items():
-        raw_claims = data.get("claims", [])
-        valid = []
-
-        for claim in raw_claims:
-            verdict = validate_claim(
-                question=question,
-                structured_query=structured_query,
-                claim=claim,
-                prompt_template=validate_p
+    async def retrieve(structured_query, cached):
+        if structured_query.get("error"):
+            return {}
+        if cached and cached["hit"]:
+            return cached["hit"]["retrieved"]
+
+        deadline = budget.stage("retrieve")
+        retrieved = await sched.call(
+            retrieve_top_k_per_paper,
+            structured_query=structured_query,
+            k=6,
+            collection_id=collection_id,
+            deadline=deadline,
+            # Mostly query encoding and waiting on a cold index; holding a
+            # cpu slot here would stall retrieval on resident collections
+            resource=None,
+            stage="retrieve"
+        )
+        if deadline.degraded:
+            budget.mark_degraded("retrieve")
+        # Degraded parses and lexical rankings are not worth reusing
+        if cached and not {"parse", "retrieve"} & set(budget.degraded):
+            semantic_cache.insert(
+                cached["vector"], collection_id, cached["version"],
+                {"structured_query": structured_query, "retrieved": retrieved},
+                question=question
             )
+        return retrieved
+
+    sched.add("lookup", lookup)
+    sched.add("parse", parse, deps=["lookup"])
+    sched.add("retrieve", retrieve, deps=["parse", "lookup"])
+    results = await sched.run()
+    if "retrieve" not in results:
+        return {
+            "stage": "error",
+            "error": "; ".join(f"{n}: {e}" for n, e in sched.errors.items()),
+            "claims": {},
+            "graph_stats": {"data": [], "y_max": 0}
+        }
+    cache_hit = (results["lookup"] or {}).get("hit")
+
+    structured_query = results["parse"]
+    if structured_query.get("error"):
+        return {"stage": "error", "claims": {}, "graph_stats": {"data": [], "y_max": 0}}
 
-            if isinstance(verdict, dict) and verdict.get("is_valid") is True:
-                valid.append(claim)
-            elif verdict is True or verdict is None:
-                valid.append(claim)
-
-        if valid:
-            summarized = summarize_claims(valid)
-            ranked = rank_claims(question=question, claims=summarized, prompt_template=rank_p)
-            validated_claims[paper_id] = {"claims": ranked[:3]}
-        else:
-            validated_claims[paper_id] = {"claims": []}
-
-    # 5. Result
+    # 3-6. Extract -> dedup -> validate -> summarize -> rank, pipelined per paper
+    retrieved = results["retrieve"]
+    dedup_stats = {}
+    for paper_id, chunks in retrieved.items():
+        _add_paper_tasks(sched, budget, paper_id, chunks, question, structured_query, prompts, dedup_stats)
+    results = await sched.run()
+
+    # A failed paper chain only costs that paper its claims
+    failed_papers = {}
+    for pid in retrieved:
+        if f"rank:{pid}" in results:
+            continue
+        for stage in PAPER_STAGES:
+            if f"{stage}:{pid}" in sched.errors:
+                failed_papers[pid] = {"stage": stage, "error": sched.errors[f"{stage}:{pid}"]}
+                break
+    validated_claims = {pid: results.get(f"rank:{pid}", {"claims": []}) for pid in retrieved}
+
+    # 7. Result
     graph_stats = compute_graph_stats(validated_claims)
 
     return {
         "stage": "Synthesizing results…",
         "claims": validated_claims,
-        "graph_stats": graph_stats
+        "graph_stats": graph_stats,
+        "degraded_stages": budget.degraded,
+        "failed_papers": failed_papers,
+        "elapsed_s": round(budget.elapsed(), 3),
+        "dedup": {
+            "claims_removed": sum(st["removed"] for st in dedup_stats.values()),
+            "validate_calls_saved": sum(st["validate_calls_saved"] for st in dedup_stats.values()),
+            "summarize_calls_saved_max": sum(st["summarize_calls_saved_max"] for st in dedup_stats.values()),
+            "per_paper": dedup_stats
+        },
+        "cache": {
+            "hit": cache_hit is not None,
+            "similarity": cache_hit["similarity"] if cache_hit else None
+        },
+        "trace": {
+            "spans": sched.trace,
+            "critical_path": sched.critical_path()
+        }
     }
 
 
+def run_pipeline(payload) -> dict:
+    return asyncio.run(arun_pipeline(payload))
+
+
 # ---------------- LANGSERVE ----------------
-rag_chain = RunnableLambda(run_pipeline).with_types(input_type=ResearchInput)
+rag_chain = RunnableLambda(run_pipeline, afunc=arun_pipeline).with_types(input_type=ResearchInput)
 add_routes(app, rag_chain, path="/analyze")
 
 
 # ---------------- UPLOAD ENDPOINT ----------------
+# Sync so FastAPI runs ingestion in its threadpool instead of blocking
+# the event loop that serves every other collection's /analyze.
 @app.post("/upload")
-async def upload(files: List[UploadFile] = File(...)):
-    if os.path.exists("data/processed_embeddings.npy"):
-        os.remove("data/processed_embeddings.npy")
-    if os.path.exists("data/embedding_meta.json"):
-        os.remove("data/embedding_meta.json")
+def upload(
+    files: List[UploadFile] = File(...),
+    collection_id: str = Form(DEFAULT_COLLECTION)
+):
+    try:
+        paths = collection_paths(collection_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    from scripts.ingest_pdf import ingest_pdfs
+
+    # One upload per collection at a time, so two uploads never mix
+    # their papers or delete each other's files mid-ingest
+    with ingest_lock(paths["root"]):
+        # Same lock workers hold while publishing, so we never delete a
+        # collection's arrays halfway through another worker's build
+        with publish_lock(paths["root"]):
+            for key in ("embeddings", "evidence", "meta"):
+                if os.path.exists(paths[key]):
+                    os.remove(paths[key])
+
+        if os.path.exists(paths["papers"]):
+            shutil.rmtree(paths["papers"])
+        os.makedirs(paths["papers"], exist_ok=True)
+
+        for file in files:
+            path = os.path.join(paths["papers"], os.path.basename(file.filename))
+            with open(path, "wb") as f:
+                shutil.copyfileobj(file.file, f)
+
+        ingest_pdfs(collection_id)
+        invalidate_collection(collection_id)
+    return {"status": "success", "collection_id": collection_id}
+
+
+# ---------------- COLLECTIONS ----------------
+@app.get("/collections")
+async def collections():
+    return {
+        "collections": list_collections(),
+        "index_cache": index_cache.stats()
+    }
 
-    if os.path.exists("data/papers"):
-        shutil.rmtree("data/papers")
-    os.makedirs("data/papers", exist_ok=True)
 
-    for file in files:
-        path = os.path.join("data/papers", file.filename)
-        with open(path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
+# ---------------- PROBES ----------------
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
 
-    from scripts.ingest_pdf import ingest_pdfs
-    ingest_pdfs()
-    return {"status": "success"}
+
+@app.get("/readyz")
+async def readyz():
+    return JSONResponse(
+        status_code=200 if startup_state.ready else 503,
+        content=startup_state.report()
+    )
+
+
+# ---------------- METRICS ----------------
+@app.get("/metrics")
+async def metrics():
+    return {
+        "embedding_batcher": query_batcher.stats(),
+        "index_cache": index_cache.stats(),
+        "semantic_cache": semantic_cache.stats()
+    }
 
 
 if __name__ == "__main__":
     import uvicorn
+
+    # Multiple workers need an import string; pair with SHARED_INDEX=1 and
+    # ENCODER_URL so workers share one corpus copy and one encoder.
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
     uvicorn.run(
-        app,
+        "server:app" if workers > 1 else app,
         host="0.0.0.0",
-        port=int(os.environ.get("PORT", 8000))
+        port=int(os.environ.get("PORT", 8000)),
+        workers=workers
     )